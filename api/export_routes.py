@@ -0,0 +1,48 @@
+import os
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from controllers import export_controller
+import util.logger_config as logger_config
+
+router = APIRouter()
+logger = logger_config.get_logger(__name__)
+
+
+def _iter_file(file_obj, chunk_size: int = 64 * 1024):
+    """Lee el archivo por bloques y lo cierra al terminar la descarga."""
+    with file_obj:
+        while chunk := file_obj.read(chunk_size):
+            yield chunk
+
+@router.get("/exports/{export_id}")
+def download_export(export_id: str, fmt: str | None = Query(None, alias="format")):
+    """Descarga en streaming el resultado exportado de una consulta."""
+    job = export_controller.get_export(export_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Exportación no encontrada o expirada."})
+    if job["status"] in ("pending", "running"):
+        return JSONResponse(status_code=202, content={"id": export_id, "status": job["status"]})
+
+    if job["status"] == "failed":
+        logger.error(f"Se solicitó la exportación fallida '{export_id}': {job['errors']}")
+        return JSONResponse(status_code=409, content={"error": "No se pudo generar la exportación.",
+                                                      "status": job["status"]})
+
+    fmt = fmt.lower() if fmt else None
+    file_path, fmt = export_controller.get_export_file(export_id, fmt)
+    if file_path is None:
+        logger.warning(f"Exportación '{export_id}' sin archivo disponible para formato {fmt}: "
+                       f"{job['errors'].get(fmt, 'formato no solicitado')}")
+        return JSONResponse(status_code=404, content={"error": f"La exportación no está disponible en formato '{fmt}'.",
+                                                      "status": job["status"], "formats": list(job["files"])})
+
+    # Se abre el archivo antes de responder para que una eviction concurrente no corte la descarga.
+    try:
+        file_obj = open(file_path, "rb")
+    except FileNotFoundError:
+        return JSONResponse(status_code=404, content={"error": "Exportación no encontrada o expirada."})
+    headers = {
+        "Content-Disposition": f'attachment; filename="resultado_{export_id}.{fmt}"',
+        "Content-Length": str(os.fstat(file_obj.fileno()).st_size),
+    }
+    return StreamingResponse(_iter_file(file_obj), media_type=export_controller.SUPPORTED_FORMATS[fmt], headers=headers)
@@ -3,6 +3,7 @@ from pydantic import BaseModel
 
 class AskRequest(BaseModel):
     question: str
+    export_formats: list[str] | None = None
 
 class DocumentRequest(BaseModel):
     name: str
@@ -1,7 +1,9 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from controllers import orchestator_controller
 from controllers import doc_llm_controller
+from controllers import export_controller
 import api.requests as requests
 import base64
 import util.logger_config as logger_config
@@ -19,9 +21,16 @@ async def handle_query(request: requests.AskRequest):
     """Recibe una pregunta, la procesa con el orquestador y devuelve la respuesta."""
     logger.info(f"Recibida consulta: '{request.question}'")
     try:
-        response = orchestator_controller.user_query(request.question)
+        export_formats = export_controller.normalize_formats(request.export_formats)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    try:
+        response, export_id = orchestator_controller.user_query(request.question, export_formats)
         logger.info(f"Respuesta generada: {response}")
-        return {"answer": response}
+        export = None
+        if export_id:
+            export = {"id": export_id, "formats": export_formats, "url": f"/exports/{export_id}"}
+        return {"answer": response, "export": export}
     except Exception as e:
         logger.error(f"Error al procesar la consulta: {e}")
         return {"error": "Ocurrió un error al procesar la consulta."}
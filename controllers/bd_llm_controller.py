@@ -4,6 +4,7 @@ from sqlalchemy import create_engine, text, inspect, Column, Integer, String, Me
 from sqlalchemy.orm import sessionmaker
 import pandas as pd
 from partial_json_parser import loads
+from controllers import export_controller
 
 
 
@@ -143,39 +144,24 @@ def build_and_execute_query(query_params: dict):
     print(f"Params: {params}")
 
     with SessionLocal() as session:
-        query = text(query_str)
-        result = session.execute(query, params)
+        # Los parámetros quedan enlazados a la consulta para poder reejecutarla (p. ej. al exportar)
+        query = text(query_str).bindparams(**params)
+        result = session.execute(query)
         df = pd.read_sql_query(query, engine)
         return df, query
 
-def export_to_excel(df, filename="query_result.xlsx"):
-    """
-    Exporta un DataFrame de Pandas a un archivo Excel.
-    """
-    try:
-        # Crear el directorio si no existe
-        output_dir = 'output'
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-        file_path = os.path.join(output_dir, filename)
-        df.to_excel(file_path, index=False)
-        print(f"\nResultados exportados exitosamente a '{os.path.abspath(file_path)}'")
-        return os.path.abspath(file_path)
-    except Exception as e:
-        print(f"\nError al exportar a Excel: {e}")
-        return None
-
-def answer_user_query(llm_instance, user_question: str):
+def answer_user_query(llm_instance, user_question: str, export_formats=None):
     """
     Función principal que orquesta la respuesta a la pregunta de un usuario.
 
     Args:
         llm_instance: Instancia del LLM.
         user_question: Pregunta del usuario.
+        export_formats: Formatos a exportar en segundo plano (por defecto CSV y Parquet).
     Returns:
         [0] DataFrame con los resultados de la consulta.
         [1] String con la consulta SQL.
+        [2] Id de la exportación en segundo plano, o None si no hubo resultados o no se pudo encolar.
     """
     print(f"\n--- Procesando la pregunta: '{user_question}' ---")
     try:
@@ -188,18 +174,24 @@ def answer_user_query(llm_instance, user_question: str):
 
         # 3. Construir y ejecutar la consulta de forma segura
         print("Construyendo y ejecutando la consulta SQL...")
-        resultados_df = build_and_execute_query(params_from_llm)
+        resultados_df, query = build_and_execute_query(params_from_llm)
 
-        # 4. Mostrar los resultados y exportar a Excel
+        # 4. Mostrar los resultados y encolar la exportación fuera del flujo de la petición
         print("\n--- Resultados de la Consulta (DataFrame) ---")
         if not resultados_df.empty:
             print(resultados_df)
-            export_to_excel(resultados_df[0])
-            return resultados_df
+            # Un error al encolar la exportación no debe descartar el resultado de la consulta
+            export_id = None
+            try:
+                export_id = export_controller.submit_export(engine, query, export_formats)
+            except Exception as e:
+                print(f"\nError al encolar la exportación: {e}")
+            return resultados_df, query, export_id
         else:
             print("No se encontraron resultados.")
+            return resultados_df, query, None
 
     except (ValueError, Exception) as e:
         print(f"\nError al procesar la consulta: {e}")
-        return None
+        return None, None, None
     
\ No newline at end of file
@@ -0,0 +1,463 @@
+import os
+import re
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from util.logger_config import get_logger
+
+logger = get_logger(__name__)
+
+OUTPUT_DIR = os.environ.get("EXPORT_OUTPUT_DIR", "output")
+EXPORT_TTL_SECONDS = int(os.environ.get("EXPORT_TTL_SECONDS", 3600))
+EXPORT_MAX_BYTES = int(os.environ.get("EXPORT_MAX_BYTES", 500 * 1024 * 1024))
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", 50000))
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", 2))
+EXPORT_SWEEP_SECONDS = int(os.environ.get("EXPORT_SWEEP_SECONDS", 300))
+EXPORT_MAX_PENDING = int(os.environ.get("EXPORT_MAX_PENDING", 8))
+
+# Límite de filas de una hoja de Excel (incluye la fila de encabezados).
+XLSX_MAX_ROWS = 1048576
+
+# XLSX no se genera por defecto: solo si el usuario lo pide explícitamente.
+DEFAULT_FORMATS = ("csv", "parquet")
+SUPPORTED_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+_executor = None
+_executor_lock = threading.Lock()
+# Cupos para trabajos encolados o en ejecución: cuando se agotan, la exportación se rechaza.
+_pending = threading.BoundedSemaphore(EXPORT_MAX_PENDING)
+_jobs = {}
+_jobs_lock = threading.Lock()
+_evict_lock = threading.Lock()
+_sweeper_stop = threading.Event()
+_sweeper = None
+
+
+def _as_string(series: pd.Series):
+    """Convierte una columna a texto conservando los nulos."""
+    return series.astype(str).where(series.notna(), None)
+
+
+class _CsvWriter:
+    """Escribe los bloques a CSV, agregando al archivo en cada bloque."""
+
+    def __init__(self, file_path: str):
+        self.file = open(file_path, "w", encoding="utf-8", newline="")
+        self.header = True
+
+    def write(self, chunk: pd.DataFrame):
+        chunk.to_csv(self.file, header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+    def abort(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    """Escribe los bloques a Parquet, un row group por bloque."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.writer = None
+        self.schema = None
+
+    def _to_table(self, chunk: pd.DataFrame):
+        import pyarrow as pa
+
+        # SQLite no fuerza tipos: una columna object puede mezclar números y texto,
+        # así que todas las columnas object se escriben como texto.
+        chunk = chunk.copy(deep=False)
+        for i in range(chunk.shape[1]):
+            if chunk.dtypes.iloc[i] == object:
+                chunk.isetitem(i, _as_string(chunk.iloc[:, i]))
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if self.schema is None or table.schema.equals(self.schema):
+            return table
+        # El esquema lo fija el primer bloque; los siguientes se convierten a él
+        # (por ejemplo, enteros que llegan como float porque el bloque trae nulos).
+        columns = [table.column(i).cast(self.schema.field(i).type) for i in range(table.num_columns)]
+        return pa.Table.from_arrays(columns, schema=self.schema)
+
+    def write(self, chunk: pd.DataFrame):
+        import pyarrow.parquet as pq
+
+        table = self._to_table(chunk)
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = pq.ParquetWriter(self.file_path, self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            pq.write_table(pa.table({}), self.file_path)
+            return
+        self.writer.close()
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _XlsxWriter:
+    """Escribe los bloques a Excel usando el modo write-only de openpyxl."""
+
+    def __init__(self, file_path: str):
+        from openpyxl import Workbook
+
+        self.file_path = file_path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.rows = 0
+
+    def write(self, chunk: pd.DataFrame):
+        if self.rows == 0:
+            self.sheet.append([str(column) for column in chunk.columns])
+            self.rows = 1
+        if self.rows + len(chunk) > XLSX_MAX_ROWS:
+            raise ValueError(f"El resultado supera el límite de Excel ({XLSX_MAX_ROWS - 1} filas de datos); "
+                             f"use CSV o Parquet.")
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            self.sheet.append(row)
+        self.rows += len(chunk)
+
+    def close(self):
+        self.workbook.save(self.file_path)
+
+    def abort(self):
+        # Cierra la hoja y elimina el archivo temporal que openpyxl usa para las filas.
+        if self.rows:
+            self.sheet.close()
+            self.sheet._writer.cleanup()
+
+
+_WRITERS = {
+    "csv": _CsvWriter,
+    "parquet": _ParquetWriter,
+    "xlsx": _XlsxWriter,
+}
+
+
+def normalize_formats(formats=None):
+    """
+    Valida y normaliza la lista de formatos solicitados.
+    Si no se indica ninguno se usan los formatos por defecto (CSV y Parquet).
+    """
+    if not formats:
+        return list(DEFAULT_FORMATS)
+    normalized = []
+    for fmt in formats:
+        fmt = str(fmt).lower().strip()
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"Formato de exportación no soportado: '{fmt}'.")
+        if fmt not in normalized:
+            normalized.append(fmt)
+    return normalized
+
+
+def artifact_path(export_id: str, fmt: str):
+    """Ruta del archivo exportado para un id y formato dados."""
+    return os.path.join(OUTPUT_DIR, f"{export_id}.{fmt}")
+
+
+def _is_expired(file_path: str, now: float):
+    """Un archivo se considera vencido si ya no existe o superó EXPORT_TTL_SECONDS."""
+    try:
+        return now - os.path.getmtime(file_path) > EXPORT_TTL_SECONDS
+    except OSError:
+        return True
+
+
+def _check_size(file_path: str):
+    size = os.path.getsize(file_path)
+    if size > EXPORT_MAX_BYTES:
+        raise ValueError(f"El archivo generado ({size} bytes) supera el límite "
+                         f"EXPORT_MAX_BYTES ({EXPORT_MAX_BYTES} bytes).")
+
+
+def _run_job(export_id: str, engine_instance, query):
+    with _jobs_lock:
+        job = _jobs[export_id]
+        job["status"] = "running"
+        formats = list(job["formats"])
+
+    writers = {}
+    errors = {}
+
+    def fail(fmt, error):
+        errors[fmt] = str(error)
+        logger.error(f"Error al exportar '{export_id}' a {fmt}: {error}")
+        writer = writers.pop(fmt, None)
+        if writer is not None:
+            try:
+                writer.abort()
+            except Exception:
+                pass
+        tmp_path = f"{artifact_path(export_id, fmt)}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    try:
+        for fmt in formats:
+            try:
+                writers[fmt] = _WRITERS[fmt](f"{artifact_path(export_id, fmt)}.tmp")
+            except Exception as e:
+                fail(fmt, e)
+
+        # La consulta se vuelve a ejecutar por bloques: el trabajo nunca tiene
+        # el resultado completo en memoria y cada bloque alimenta todos los formatos.
+        try:
+            for chunk in pd.read_sql_query(query, engine_instance, chunksize=EXPORT_CHUNK_ROWS):
+                for fmt, writer in list(writers.items()):
+                    try:
+                        writer.write(chunk)
+                        # XLSX solo crea el archivo al cerrarse; su tamaño se valida al final.
+                        tmp_path = f"{artifact_path(export_id, fmt)}.tmp"
+                        if os.path.exists(tmp_path):
+                            _check_size(tmp_path)
+                    except Exception as e:
+                        fail(fmt, e)
+                if not writers:
+                    break
+        except Exception as e:
+            for fmt in list(writers):
+                fail(fmt, e)
+
+        for fmt, writer in list(writers.items()):
+            file_path = artifact_path(export_id, fmt)
+            tmp_path = f"{file_path}.tmp"
+            try:
+                writer.close()
+                _check_size(tmp_path)
+                # Renombrado atómico: nunca se sirve un archivo a medio escribir.
+                os.replace(tmp_path, file_path)
+                with _jobs_lock:
+                    job["files"][fmt] = file_path
+                logger.info(f"Exportación '{export_id}' generada en formato {fmt}: {file_path}")
+            except Exception as e:
+                fail(fmt, e)
+
+        with _jobs_lock:
+            job["errors"] = errors
+            job["status"] = "failed" if len(errors) == len(formats) else "done"
+            job["finished_at"] = time.time()
+    finally:
+        _pending.release()
+
+    # Los archivos recién generados no cuentan como candidatos a eliminar por tamaño.
+    evict_expired(protected={export_id})
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+        return _executor
+
+
+def submit_export(engine_instance, query, formats=None):
+    """
+    Encola la exportación del resultado de una consulta en segundo plano.
+
+    Args:
+        engine_instance: Engine de SQLAlchemy sobre el que se ejecuta la consulta.
+        query: Consulta SQL (con sus parámetros ya enlazados).
+        formats: Lista de formatos a generar ("csv", "parquet", "xlsx").
+    Returns:
+        El identificador único del artefacto exportado.
+    Raises:
+        RuntimeError: Si ya hay EXPORT_MAX_PENDING exportaciones en curso.
+    """
+    formats = normalize_formats(formats)
+    if not _pending.acquire(blocking=False):
+        raise RuntimeError(f"Hay {EXPORT_MAX_PENDING} exportaciones en curso; no se encoló una nueva.")
+
+    export_id = uuid.uuid4().hex
+    try:
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        with _jobs_lock:
+            _jobs[export_id] = {
+                "id": export_id,
+                "status": "pending",
+                "formats": formats,
+                "files": {},
+                "errors": {},
+                "created_at": time.time(),
+                "finished_at": None,
+            }
+        _get_executor().submit(_run_job, export_id, engine_instance, query)
+    except Exception:
+        with _jobs_lock:
+            _jobs.pop(export_id, None)
+        _pending.release()
+        raise
+    logger.info(f"Exportación '{export_id}' encolada en formatos {formats}.")
+    return export_id
+
+
+def get_export(export_id: str):
+    """
+    Devuelve el estado de una exportación, o None si no existe o fue eliminada.
+    Los artefactos que sobreviven a un reinicio se recuperan desde el disco.
+    """
+    if not _ID_PATTERN.match(export_id or ""):
+        return None
+    with _jobs_lock:
+        job = _jobs.get(export_id)
+        if job is not None:
+            job = {**job, "formats": list(job["formats"]), "files": dict(job["files"])}
+
+    now = time.time()
+    if job is not None:
+        # La retención se verifica al consultar, sin esperar al próximo barrido.
+        job["files"] = {fmt: path for fmt, path in job["files"].items() if not _is_expired(path, now)}
+        if job["status"] == "done" and not job["files"]:
+            return None
+        return job
+
+    files = {fmt: artifact_path(export_id, fmt) for fmt in SUPPORTED_FORMATS
+             if not _is_expired(artifact_path(export_id, fmt), now)}
+    if not files:
+        return None
+    return {
+        "id": export_id,
+        "status": "done",
+        "formats": list(files),
+        "files": files,
+        "errors": {},
+        "created_at": None,
+        "finished_at": None,
+    }
+
+
+def get_export_file(export_id: str, fmt: str = None):
+    """
+    Resuelve el archivo de una exportación terminada.
+
+    Returns:
+        [0] Ruta del archivo, o None si aún no está disponible.
+        [1] Formato resuelto.
+    """
+    job = get_export(export_id)
+    if job is None:
+        return None, fmt
+    if fmt is None:
+        fmt = next((f for f in job["formats"] if f in job["files"]), None)
+    file_path = job["files"].get(fmt)
+    if file_path is None or not os.path.exists(file_path):
+        return None, fmt
+    return file_path, fmt
+
+
+def evict_expired(now: float = None, protected=None):
+    """
+    Aplica la política de retención sobre el directorio de salida:
+    elimina los archivos más antiguos que EXPORT_TTL_SECONDS y, si el total
+    sigue superando EXPORT_MAX_BYTES, los más antiguos hasta quedar bajo el límite.
+
+    Args:
+        now: Instante de referencia (por defecto, la hora actual).
+        protected: Ids de exportaciones cuyos archivos no se eliminan por tamaño.
+    """
+    if not os.path.isdir(OUTPUT_DIR):
+        return []
+    now = now if now is not None else time.time()
+    protected = set(protected or ())
+    removed = []
+
+    with _evict_lock:
+        entries = []
+        for entry in os.scandir(OUTPUT_DIR):
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            # Un .tmp reciente pertenece a una escritura en curso; solo se limpian los abandonados.
+            if entry.name.endswith(".tmp") and now - stat.st_mtime <= EXPORT_TTL_SECONDS:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        # La foto de trabajos en curso se toma después del escaneo: cualquier
+        # trabajo cuyos archivos aparezcan en él ya figura aquí.
+        with _jobs_lock:
+            in_progress = {job_id for job_id, job in _jobs.items()
+                           if job["status"] in ("pending", "running")}
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            export_id = os.path.basename(path).split(".", 1)[0]
+            if export_id in in_progress:
+                continue
+            if now - mtime <= EXPORT_TTL_SECONDS:
+                if total_bytes <= EXPORT_MAX_BYTES or export_id in protected:
+                    continue
+            try:
+                os.remove(path)
+                total_bytes -= size
+                removed.append(path)
+            except OSError as e:
+                logger.error(f"No se pudo eliminar el archivo exportado '{path}': {e}")
+
+        removed_names = {os.path.basename(path) for path in removed}
+        with _jobs_lock:
+            for job_id, job in list(_jobs.items()):
+                if job["status"] in ("pending", "running"):
+                    continue
+                for fmt, path in list(job["files"].items()):
+                    if os.path.basename(path) in removed_names:
+                        del job["files"][fmt]
+                # Trabajos sin archivos (eliminados o fallidos) se olvidan al vencer su retención.
+                if not job["files"] and (job["status"] == "done" or now - job["finished_at"] > EXPORT_TTL_SECONDS):
+                    del _jobs[job_id]
+
+        if removed:
+            logger.info(f"Se eliminaron {len(removed)} archivos exportados por la política de retención.")
+
+    return removed
+
+
+def _sweep_loop():
+    while not _sweeper_stop.wait(EXPORT_SWEEP_SECONDS):
+        try:
+            evict_expired()
+        except Exception as e:
+            logger.error(f"Error en el barrido de exportaciones: {e}")
+
+
+def start():
+    """Inicia el pool de exportación y el barrido periódico de retención cada EXPORT_SWEEP_SECONDS."""
+    global _sweeper
+    _get_executor()
+    if _sweeper is not None and _sweeper.is_alive():
+        return
+    _sweeper_stop.clear()
+    _sweeper = threading.Thread(target=_sweep_loop, name="export-sweeper", daemon=True)
+    _sweeper.start()
+
+
+def shutdown(wait: bool = True):
+    """Detiene el barrido periódico y el pool de exportación, esperando los trabajos en curso."""
+    global _executor, _sweeper
+    _sweeper_stop.set()
+    if _sweeper is not None and wait:
+        _sweeper.join()
+    _sweeper = None
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
@@ -98,7 +98,14 @@ def documents_context():
 
     return context_data
 
-def user_query(user_question: str):
+def user_query(user_question: str, export_formats=None):
+    """
+    Responde la pregunta del usuario combinando base de datos y documentos.
+
+    Returns:
+        [0] String con la respuesta final.
+        [1] Id de la exportación de resultados en segundo plano, o None.
+    """
     logger.info(f"Recibida pregunta de usuario: '{user_question}'")
     try:
         llm = init_llm('gpt-4o')
@@ -161,9 +168,10 @@ def user_query(user_question: str):
        
 
         db_data_str = "No se consultaron datos de la base de datos."
+        export_id = None
         if jsoned_response_conocimiento.get('base_de_datos', False):
             logger.info("Consultando la base de datos...")
-            db_result_df, sql_query = bd_llm_controller.answer_user_query(llm, user_question)
+            db_result_df, sql_query, export_id = bd_llm_controller.answer_user_query(llm, user_question, export_formats)
             if db_result_df is not None and not db_result_df.empty:
                 db_data_str = db_result_df.to_json(orient='records', indent=4)
             else:
@@ -207,14 +215,14 @@ def user_query(user_question: str):
         final_response = init_llm('gpt-4o').invoke(final_prompt)
         logger.info("Respuesta generada por el LLM exitosamente.")
         client.close() # Cerrar la conexión después de usarla
-        return final_response.content
+        return final_response.content, export_id
 
     except Exception as e:
         logger.error(f"Error al procesar la consulta del usuario: {e}")
         # Asegurarse de que el cliente exista y esté conectado antes de intentar cerrarlo
         if 'client' in locals() and client.is_connected():
             client.close()
-        return "Lo siento, ocurrió un error al procesar tu pregunta. Por favor, intenta de nuevo más tarde."
+        return "Lo siento, ocurrió un error al procesar tu pregunta. Por favor, intenta de nuevo más tarde.", None
 
     
     
\ No newline at end of file
@@ -5,7 +5,8 @@ from fastapi import FastAPI
 from uvicorn import run
 from contextlib import asynccontextmanager
 from api import routes as api_routes
-from controllers import orchestator_controller
+from api import export_routes
+from controllers import orchestator_controller, export_controller
 
 logger = logger_config.get_logger(__name__)
 
@@ -13,8 +14,13 @@ logger = logger_config.get_logger(__name__)
 async def lifespan(app: FastAPI):
     """Gestiona el ciclo de vida de la aplicación, incluyendo el cierre de conexiones."""
     logger.info("Servidor iniciado.")
+    # Limpiar exportaciones vencidas de ejecuciones anteriores
+    export_controller.evict_expired()
+    export_controller.start()
     yield
     # Lógica de apagado
+    logger.info("Esperando exportaciones pendientes...")
+    export_controller.shutdown()
     logger.info("Cerrando la conexión con Weaviate...")
     #cerrar conección con weaviate
     orchestator_controller.weaviate_client.close()
@@ -24,6 +30,7 @@ app = FastAPI(lifespan=lifespan)
 
 # Incluir las rutas de la API
 app.include_router(api_routes.router)
+app.include_router(export_routes.router)
 
 if __name__ == "__main__":
     logger.info("Iniciando servidor FastAPI en http://localhost:8000")
@@ -0,0 +1,39 @@
+import time
+import pytest
+from sqlalchemy import create_engine, text
+from controllers import export_controller
+
+
+@pytest.fixture(autouse=True)
+def export_dir(tmp_path, monkeypatch):
+    """Aísla el directorio de salida y el registro de trabajos en cada test."""
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    monkeypatch.setattr(export_controller, "OUTPUT_DIR", str(output_dir))
+    monkeypatch.setattr(export_controller, "_jobs", {})
+    yield output_dir
+    export_controller.shutdown()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE ordenes (id INTEGER, proveedor TEXT, monto REAL, codigo)"))
+        conn.execute(text("INSERT INTO ordenes VALUES (:id, :proveedor, :monto, :codigo)"), [
+            {"id": i, "proveedor": f"prov_{i % 3}", "monto": i * 1.5, "codigo": i if i % 2 else f"C{i}"}
+            for i in range(10)
+        ])
+    yield engine
+    engine.dispose()
+
+
+def wait_for(export_id: str, timeout: float = 10):
+    """Espera a que termine un trabajo de exportación y devuelve su estado."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = export_controller.get_export(export_id)
+        if job is None or job["status"] not in ("pending", "running"):
+            return job
+        time.sleep(0.02)
+    raise TimeoutError(export_id)
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+import uuid
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from controllers import export_controller
+from conftest import wait_for
+
+
+def _write_artifact(output_dir, export_id, fmt, size=10, age=0):
+    path = output_dir / f"{export_id}.{fmt}"
+    path.write_bytes(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_export_writes_every_format_in_chunks(engine, export_dir, monkeypatch):
+    monkeypatch.setattr(export_controller, "EXPORT_CHUNK_ROWS", 3)
+    export_id = export_controller.submit_export(engine, text("SELECT * FROM ordenes"), ["csv", "parquet", "xlsx"])
+
+    job = wait_for(export_id)
+
+    assert job["status"] == "done"
+    assert sorted(job["files"]) == ["csv", "parquet", "xlsx"]
+    assert len(pd.read_csv(job["files"]["csv"])) == 10
+    parquet = pd.read_parquet(job["files"]["parquet"])
+    assert parquet["id"].tolist() == list(range(10))
+    # La columna "codigo" mezcla enteros y texto: se escribe como texto.
+    assert parquet["codigo"].tolist()[:2] == ["C0", "1"]
+    assert len(pd.read_excel(job["files"]["xlsx"])) == 10
+    assert not list(export_dir.glob("*.tmp"))
+
+
+def test_parquet_casts_later_chunks_to_first_schema(engine, monkeypatch):
+    monkeypatch.setattr(export_controller, "EXPORT_CHUNK_ROWS", 3)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE ordenes SET id = NULL WHERE id = 4"))
+    # Igual que en bd_llm_controller: los parámetros viajan enlazados a la consulta.
+    query = text("SELECT id FROM ordenes ORDER BY rowid LIMIT :limit").bindparams(limit=10)
+    export_id = export_controller.submit_export(engine, query, ["parquet"])
+
+    job = wait_for(export_id)
+
+    assert job["status"] == "done"
+    parquet = pd.read_parquet(job["files"]["parquet"], dtype_backend="numpy_nullable")
+    assert str(parquet["id"].dtype) == "Int64"
+    assert parquet["id"].isna().tolist() == [i == 4 for i in range(10)]
+
+
+def test_xlsx_over_row_limit_fails_only_that_format(engine, monkeypatch):
+    monkeypatch.setattr(export_controller, "XLSX_MAX_ROWS", 5)
+    export_id = export_controller.submit_export(engine, text("SELECT * FROM ordenes"), ["xlsx", "csv"])
+
+    job = wait_for(export_id)
+
+    assert job["status"] == "done"
+    assert list(job["files"]) == ["csv"]
+    assert "límite de Excel" in job["errors"]["xlsx"]
+
+
+def test_artifact_over_size_budget_fails_job(engine, export_dir, monkeypatch):
+    monkeypatch.setattr(export_controller, "EXPORT_MAX_BYTES", 50)
+    export_id = export_controller.submit_export(engine, text("SELECT * FROM ordenes"), ["csv"])
+
+    job = wait_for(export_id)
+
+    assert job["status"] == "failed"
+    assert "EXPORT_MAX_BYTES" in job["errors"]["csv"]
+    assert list(export_dir.iterdir()) == []
+
+
+def test_query_error_fails_job(engine):
+    export_id = export_controller.submit_export(engine, text("SELECT * FROM no_existe"), ["csv", "parquet"])
+
+    job = wait_for(export_id)
+
+    assert job["status"] == "failed"
+    assert set(job["errors"]) == {"csv", "parquet"}
+
+
+def test_submit_rejects_when_queue_is_full(engine, monkeypatch):
+    monkeypatch.setattr(export_controller, "_pending", threading.BoundedSemaphore(1))
+    export_controller._pending.acquire()
+
+    with pytest.raises(RuntimeError):
+        export_controller.submit_export(engine, text("SELECT * FROM ordenes"))
+    assert export_controller._jobs == {}
+
+
+def test_submit_works_after_shutdown(engine):
+    export_controller.start()
+    export_controller.shutdown()
+
+    export_id = export_controller.submit_export(engine, text("SELECT * FROM ordenes"), ["csv"])
+
+    assert wait_for(export_id)["status"] == "done"
+
+
+def test_evict_removes_expired_files(export_dir):
+    old = _write_artifact(export_dir, uuid.uuid4().hex, "csv", age=export_controller.EXPORT_TTL_SECONDS + 10)
+    fresh = _write_artifact(export_dir, uuid.uuid4().hex, "csv")
+
+    assert export_controller.evict_expired() == [str(old)]
+    assert fresh.exists()
+
+
+def test_evict_enforces_size_budget_oldest_first(export_dir, monkeypatch):
+    monkeypatch.setattr(export_controller, "EXPORT_MAX_BYTES", 25)
+    oldest = _write_artifact(export_dir, uuid.uuid4().hex, "csv", age=30)
+    middle = _write_artifact(export_dir, uuid.uuid4().hex, "csv", age=20)
+    newest = _write_artifact(export_dir, uuid.uuid4().hex, "csv", age=10)
+
+    assert export_controller.evict_expired() == [str(oldest)]
+    assert middle.exists() and newest.exists()
+
+
+def test_evict_keeps_protected_ids_under_size_pressure(export_dir, monkeypatch):
+    monkeypatch.setattr(export_controller, "EXPORT_MAX_BYTES", 15)
+    protected_id = uuid.uuid4().hex
+    protected = _write_artifact(export_dir, protected_id, "csv", age=30)
+    other = _write_artifact(export_dir, uuid.uuid4().hex, "csv", age=10)
+
+    assert export_controller.evict_expired(protected={protected_id}) == [str(other)]
+    assert protected.exists()
+
+
+def test_evict_skips_in_progress_jobs_and_fresh_tmp_files(export_dir, monkeypatch):
+    monkeypatch.setattr(export_controller, "EXPORT_MAX_BYTES", 0)
+    running_id = uuid.uuid4().hex
+    export_controller._jobs[running_id] = {"id": running_id, "status": "running", "formats": ["csv"],
+                                           "files": {}, "errors": {}, "created_at": time.time(),
+                                           "finished_at": None}
+    running = _write_artifact(export_dir, running_id, "csv")
+    fresh_tmp = _write_artifact(export_dir, uuid.uuid4().hex, "parquet.tmp")
+    stale_tmp = _write_artifact(export_dir, uuid.uuid4().hex, "parquet.tmp",
+                                age=export_controller.EXPORT_TTL_SECONDS + 10)
+
+    assert export_controller.evict_expired() == [str(stale_tmp)]
+    assert running.exists() and fresh_tmp.exists()
+
+
+def test_get_export_hides_expired_artifacts(engine):
+    export_id = export_controller.submit_export(engine, text("SELECT * FROM ordenes"), ["csv"])
+    path = wait_for(export_id)["files"]["csv"]
+    old = time.time() - export_controller.EXPORT_TTL_SECONDS - 10
+    os.utime(path, (old, old))
+
+    assert export_controller.get_export(export_id) is None
+    assert export_controller.get_export_file(export_id) == (None, None)
+    assert os.path.exists(path)
+
+
+def test_get_export_recovers_artifacts_from_disk(export_dir):
+    export_id = uuid.uuid4().hex
+    path = _write_artifact(export_dir, export_id, "parquet")
+
+    job = export_controller.get_export(export_id)
+
+    assert job["status"] == "done"
+    assert job["files"] == {"parquet": str(path)}
+    assert export_controller.get_export_file(export_id) == (str(path), "parquet")
+
+
+def test_get_export_rejects_malformed_ids():
+    assert export_controller.get_export("../secreto") is None
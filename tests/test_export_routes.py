@@ -0,0 +1,82 @@
+import os
+import time
+import uuid
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from api import export_routes
+from controllers import export_controller
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(export_routes.router)
+    return TestClient(app)
+
+
+def _register_job(status, files=None, errors=None):
+    export_id = uuid.uuid4().hex
+    export_controller._jobs[export_id] = {"id": export_id, "status": status, "formats": ["csv", "parquet"],
+                                          "files": files or {}, "errors": errors or {},
+                                          "created_at": time.time(), "finished_at": time.time()}
+    return export_id
+
+
+def test_unknown_export_returns_404(client):
+    response = client.get(f"/exports/{uuid.uuid4().hex}")
+
+    assert response.status_code == 404
+
+
+def test_pending_export_returns_202(client):
+    export_id = _register_job("running")
+
+    response = client.get(f"/exports/{export_id}")
+
+    assert response.status_code == 202
+    assert response.json() == {"id": export_id, "status": "running"}
+
+
+def test_failed_export_returns_409_without_details(client):
+    export_id = _register_job("failed", errors={"csv": "disk full en /ruta/interna"})
+
+    response = client.get(f"/exports/{export_id}")
+
+    assert response.status_code == 409
+    assert "ruta" not in response.text
+
+
+def test_download_streams_file(client, export_dir):
+    export_id = uuid.uuid4().hex
+    path = export_dir / f"{export_id}.csv"
+    path.write_text("a,b\n1,2\n", encoding="utf-8")
+
+    response = client.get(f"/exports/{export_id}", params={"format": "csv"})
+
+    assert response.status_code == 200
+    assert response.text == "a,b\n1,2\n"
+    assert response.headers["content-type"].startswith("text/csv")
+    assert f"resultado_{export_id}.csv" in response.headers["content-disposition"]
+
+
+def test_missing_format_returns_404(client, export_dir):
+    export_id = uuid.uuid4().hex
+    (export_dir / f"{export_id}.csv").write_text("a\n1\n", encoding="utf-8")
+
+    response = client.get(f"/exports/{export_id}", params={"format": "xlsx"})
+
+    assert response.status_code == 404
+    assert response.json()["formats"] == ["csv"]
+
+
+def test_expired_export_returns_404(client, export_dir):
+    export_id = uuid.uuid4().hex
+    path = export_dir / f"{export_id}.csv"
+    path.write_text("a\n1\n", encoding="utf-8")
+    old = time.time() - export_controller.EXPORT_TTL_SECONDS - 10
+    os.utime(path, (old, old))
+
+    response = client.get(f"/exports/{export_id}")
+
+    assert response.status_code == 404